@@ -3,15 +3,14 @@
 FastAPI Chatbot Application with n8n streaming support
 """
 import asyncio
-import json
 import uuid
 from datetime import datetime
 from typing import Dict, Any, List
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request
-from fastapi.responses import HTMLResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi.responses import HTMLResponse, ORJSONResponse
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel
+import orjson
 import uvicorn
 
 from streaming_webhook import StreamingWebhookHandler
@@ -34,15 +33,44 @@ class ChatResponse(BaseModel):
 
 
 # FastAPI app
-app = FastAPI(title="n8n Chatbot", description="Streaming chatbot with n8n AI Agent")
+app = FastAPI(
+    title="n8n Chatbot",
+    description="Streaming chatbot with n8n AI Agent",
+    default_response_class=ORJSONResponse
+)
 
 # Templates
 templates = Jinja2Templates(directory="templates")
 
+# Maximum number of streaming chunks coalesced into a single WebSocket frame
+MAX_BATCH_SIZE = 64
+
+# Sentinel marking the end of a webhook stream
+_STREAM_DONE = object()
+
+class ConnectionManager:
+    """Track active WebSocket connections by session id"""
+
+    def __init__(self):
+        self.active: Dict[str, WebSocket] = {}
+
+    async def connect(self, session_id: str, websocket: WebSocket):
+        await websocket.accept()
+        self.active[session_id] = websocket
+
+    def disconnect(self, session_id: str):
+        self.active.pop(session_id, None)
+
+    def session_ids(self) -> List[str]:
+        return list(self.active.keys())
+
+    def __len__(self) -> int:
+        return len(self.active)
+
+
 # Global variables
-active_connections: Dict[str, WebSocket] = {}
+manager = ConnectionManager()
 webhook_handler = None
-parser = N8nStreamParser()
 
 
 @app.on_event("startup")
@@ -55,31 +83,44 @@ async def startup_event():
     print("🚀 Chatbot application started!")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Close the webhook handler's async client"""
+    if webhook_handler:
+        await webhook_handler.aclose()
+
+
+_chat_page_html = None
+
+
 @app.get("/", response_class=HTMLResponse)
-async def get_chat_page(request: Request):
-    """Serve the main chat page"""
-    return templates.TemplateResponse("chat.html", {"request": request})
+async def get_chat_page():
+    """Serve the main chat page (rendered once - the page is static)"""
+    global _chat_page_html
+    if _chat_page_html is None:
+        _chat_page_html = templates.get_template("chat.html").render({})
+    return HTMLResponse(_chat_page_html)
 
 
 @app.websocket("/ws/{session_id}")
 async def websocket_endpoint(websocket: WebSocket, session_id: str):
     """WebSocket endpoint for real-time chat"""
-    await websocket.accept()
-    active_connections[session_id] = websocket
-    
+    await manager.connect(session_id, websocket)
+
     try:
         while True:
             # Receive message from client
             data = await websocket.receive_text()
-            message_data = json.loads(data)
-            
+            message_data = orjson.loads(data)
+
             # Process the message
             await process_chat_message(websocket, session_id, message_data)
-            
+
     except WebSocketDisconnect:
-        if session_id in active_connections:
-            del active_connections[session_id]
         print(f"Client {session_id} disconnected")
+    finally:
+        # Runs on every exit path so the mapping never leaks entries
+        manager.disconnect(session_id)
 
 
 async def process_chat_message(websocket: WebSocket, session_id: str, message_data: Dict[str, Any]):
@@ -88,14 +129,7 @@ async def process_chat_message(websocket: WebSocket, session_id: str, message_da
     user_name = message_data.get("user", "anonymous")
     
     print(f"📨 Received message from {user_name}: {user_message}")
-    
-    # Send acknowledgment
-    await websocket.send_text(json.dumps({
-        "type": "ack",
-        "message": "Processing your message...",
-        "timestamp": datetime.now().isoformat()
-    }))
-    
+
     # Prepare data for webhook
     test_data = {
         "sessionId": session_id,
@@ -109,18 +143,13 @@ async def process_chat_message(websocket: WebSocket, session_id: str, message_da
         # Process streaming response
         complete_response = await process_streaming_response(websocket, test_data)
         
-        # Send final completion message if not already sent
+        # Signal completion - the client already assembled the content
         if complete_response:
-            await websocket.send_text(json.dumps({
-                "type": "complete",
-                "message": complete_response,
-                "timestamp": datetime.now().isoformat(),
-                "session_id": session_id
-            }))
-        
+            await websocket.send_bytes(b'{"type":"done"}')
+
     except Exception as e:
         print(f"❌ Error processing message: {e}")
-        await websocket.send_text(json.dumps({
+        await websocket.send_bytes(orjson.dumps({
             "type": "error",
             "message": f"Error processing message: {str(e)}",
             "timestamp": datetime.now().isoformat()
@@ -129,60 +158,67 @@ async def process_chat_message(websocket: WebSocket, session_id: str, message_da
 
 async def process_streaming_response(websocket: WebSocket, test_data: Dict[str, Any]) -> str:
     """Process streaming response from n8n webhook"""
-    import queue
-    import threading
-    
-    # Queue to store chunks for async processing
-    chunk_queue = queue.Queue()
-    content_parts = []
-    
-    def on_chunk(chunk, content):
-        """Handle each streaming chunk - add to queue for async processing"""
-        if content:
-            content_parts.append(content)
-            chunk_queue.put({
-                "type": "chunk",
-                "content": content,
-                "timestamp": datetime.now().isoformat()
-            })
-    
-    def on_complete(content, metadata):
-        """Handle stream completion"""
-        print(f"✅ Stream completed: {content}")
-        chunk_queue.put({
-            "type": "complete",
-            "message": content,
-            "timestamp": datetime.now().isoformat()
-        })
-    
-    # Start streaming in a separate thread
-    def stream_worker():
-        webhook_handler.process_stream(test_data, on_chunk, on_complete)
-    
-    stream_thread = threading.Thread(target=stream_worker)
-    stream_thread.start()
-    
-    # Process chunks as they arrive
-    complete_response = ""
-    while stream_thread.is_alive() or not chunk_queue.empty():
+    chunk_queue: asyncio.Queue = asyncio.Queue()
+    content_parts: List[str] = []
+    # Per-stream parser with bounded history - a shared module-level parser
+    # would accumulate chunks across every session for the process lifetime
+    parser = N8nStreamParser(max_chunks=256)
+
+    async def pump_stream():
+        """Feed content from the async webhook stream into the queue"""
         try:
-            # Wait for chunks with timeout
-            chunk_data = chunk_queue.get(timeout=0.1)
-            
-            if chunk_data["type"] == "chunk":
-                await websocket.send_text(json.dumps(chunk_data))
-            elif chunk_data["type"] == "complete":
-                complete_response = chunk_data["message"]
-                break
-                
-        except queue.Empty:
-            # No chunks available, continue waiting
-            await asyncio.sleep(0.01)
-            continue
-    
-    # Wait for thread to complete
-    stream_thread.join()
-    
+            async for data in webhook_handler.stream(test_data):
+                # Already decoded upstream - skip the string round-trip
+                chunk = parser.parse_obj(data)
+                if chunk is None:
+                    continue
+                if chunk.type == "item":
+                    if chunk.content:
+                        content_parts.append(chunk.content)
+                        chunk_queue.put_nowait(chunk.content)
+                elif chunk.type == "end":
+                    break
+        finally:
+            chunk_queue.put_nowait(_STREAM_DONE)
+
+    stream_task = asyncio.create_task(pump_stream())
+
+    # Process chunks as they arrive, coalescing queued chunks into one frame
+    done = False
+    first_frame = True
+    try:
+        while not done:
+            batch = [await chunk_queue.get()]
+            while len(batch) < MAX_BATCH_SIZE and not chunk_queue.empty():
+                batch.append(chunk_queue.get_nowait())
+
+            # One timestamp per drained batch - chunks arrive in bursts
+            timestamp = datetime.now().isoformat()
+            items = []
+            for item in batch:
+                if item is _STREAM_DONE:
+                    done = True
+                    break
+                items.append({
+                    "type": "chunk",
+                    "content": item,
+                    "timestamp": timestamp
+                })
+
+            if items:
+                # Piggyback the ack on the first frame - no separate ack write
+                if first_frame:
+                    items.insert(0, {"type": "ack"})
+                    first_frame = False
+                await websocket.send_bytes(orjson.dumps({
+                    "type": "chunks",
+                    "items": items
+                }))
+    finally:
+        await stream_task
+
+    complete_response = ''.join(content_parts)
+    print(f"✅ Stream completed: {complete_response}")
     return complete_response
 
 
@@ -200,9 +236,9 @@ async def chat_endpoint(chat_message: ChatMessage):
     }
     
     try:
-        # Process streaming response
-        complete_response = webhook_handler.process_stream(test_data)
-        
+        # Process streaming response without blocking the event loop
+        complete_response = await webhook_handler.process_stream_async(test_data)
+
         return ChatResponse(
             message=complete_response,
             session_id=session_id,
@@ -229,8 +265,8 @@ async def health_check():
 async def get_active_sessions():
     """Get list of active sessions"""
     return {
-        "active_sessions": list(active_connections.keys()),
-        "count": len(active_connections)
+        "active_sessions": manager.session_ids(),
+        "count": len(manager)
     }
 
 
@@ -239,6 +275,13 @@ if __name__ == "__main__":
         "chatbot_app:app",
         host="0.0.0.0",
         port=8000,
-        reload=True,
-        log_level="info"
+        reload=False,  # reload forces the default loop and disables uvloop
+        log_level="info",
+        loop="uvloop",
+        http="httptools",
+        ws="websockets",
+        ws_ping_interval=25.0,
+        ws_ping_timeout=10.0,
+        ws_per_message_deflate=True,
+        ws_max_size=1_048_576
     )
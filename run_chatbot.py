@@ -4,7 +4,6 @@ Chatbot 실행 스크립트
 """
 import uvicorn
 import sys
-import os
 
 def main():
     """챗봇 애플리케이션 실행"""
@@ -39,9 +38,16 @@ def main():
         "chatbot_app:app",
         host="0.0.0.0",
         port=8000,
-        reload=True,
+        reload=False,  # reload forces the default loop and disables uvloop
         log_level="info",
-        access_log=True
+        access_log=True,
+        loop="uvloop",
+        http="httptools",
+        ws="websockets",
+        ws_ping_interval=25.0,
+        ws_ping_timeout=10.0,
+        ws_per_message_deflate=True,
+        ws_max_size=1_048_576
     )
 
 if __name__ == "__main__":
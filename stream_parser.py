@@ -3,73 +3,129 @@
 Stream parser for n8n AI Agent streaming responses
 """
 import json
-import re
+import orjson
+from collections import Counter, defaultdict, deque
 from typing import Dict, Any, List, Optional, Iterator
 from dataclasses import dataclass
 from datetime import datetime
 
 
-@dataclass
+# Bound once at import so the per-line hot path skips the module
+# attribute lookup; also the single decode call site for raw lines
+_decode_line = orjson.loads
+
+
+@dataclass(slots=True)
 class StreamChunk:
     """Represents a single chunk in the stream"""
     type: str
     content: str
     metadata: Dict[str, Any]
     timestamp: Optional[datetime] = None
-    
-    def __post_init__(self):
-        if self.metadata.get('timestamp'):
-            try:
-                # Convert timestamp to datetime if it's a number
-                ts = self.metadata['timestamp']
-                if isinstance(ts, (int, float)):
-                    self.timestamp = datetime.fromtimestamp(ts / 1000)  # Convert from milliseconds
-            except (ValueError, TypeError):
-                self.timestamp = None
+
+
+def _timestamp_from_metadata(metadata: Dict[str, Any]) -> Optional[datetime]:
+    """Convert a millisecond metadata timestamp to datetime, if present"""
+    ts = metadata.get('timestamp')
+    if isinstance(ts, (int, float)):
+        try:
+            return datetime.fromtimestamp(ts / 1000)
+        except (ValueError, OverflowError, OSError):
+            return None
+    return None
 
 
 class N8nStreamParser:
     """Parser for n8n AI Agent streaming format"""
     
-    def __init__(self):
+    def __init__(self, max_chunks: Optional[int] = None):
+        """
+        Args:
+            max_chunks: Optional cap on retained chunk history. When set,
+                only the newest max_chunks chunks are kept in chunks and
+                in the type/node indexes; stream-wide stats and complete
+                content stay accurate via the incremental counters.
+        """
         self.buffer = ""
         self.current_session = None
-        self.chunks: List[StreamChunk] = []
+        self._max_chunks = max_chunks
+        self.chunks = deque(maxlen=max_chunks) if max_chunks is not None else []
+        # Incremental bookkeeping so stats/content getters stay O(1)
+        self._total_chunks = 0
+        self._type_counts: Counter = Counter()
+        self._content_parts: List[str] = []
+        self._complete_content: Optional[str] = None
+        self._min_timestamp: Optional[datetime] = None
+        self._max_timestamp: Optional[datetime] = None
+        self._timestamp_count = 0
+        # Indexes maintained at append time so filter lookups are O(1)
+        self._by_type: Dict[str, List[StreamChunk]] = defaultdict(list)
+        self._by_node: Dict[str, List[StreamChunk]] = defaultdict(list)
+        self._content_by_node: Dict[str, List[str]] = defaultdict(list)
+        # Shared metadata dicts per node - item chunks repeat identical metadata
+        self._meta_pool: Dict[str, Dict[str, Any]] = {}
     
+    def parse_obj(self, data: Dict[str, Any]) -> Optional[StreamChunk]:
+        """
+        Build a StreamChunk from an already-decoded object
+
+        Args:
+            data: Decoded chunk dict (e.g. from orjson.loads)
+
+        Returns:
+            StreamChunk if valid, None otherwise
+        """
+        chunk_type = data.get('type', 'unknown')
+        metadata = data.get('metadata', {})
+        timestamp = _timestamp_from_metadata(metadata)
+
+        # Item chunks repeat the same metadata (minus timestamp, which now
+        # lives on the chunk itself) - share one dict per node instead of
+        # retaining a copy per token
+        if chunk_type == 'item':
+            metadata = self._intern_metadata(metadata)
+
+        chunk = StreamChunk(
+            type=chunk_type,
+            content=data.get('content', ''),
+            metadata=metadata,
+            timestamp=timestamp
+        )
+
+        # Capture the chunk the bounded deque is about to displace so the
+        # index buckets can be evicted in lockstep
+        displaced = None
+        if self._max_chunks is not None and len(self.chunks) == self._max_chunks:
+            displaced = self.chunks[0]
+
+        self.chunks.append(chunk)
+        if displaced is not None:
+            self._unregister_chunk(displaced)
+        self._register_chunk(chunk)
+        return chunk
+
     def parse_line(self, line: str) -> Optional[StreamChunk]:
         """
         Parse a single line from the stream
-        
+
         Args:
             line: Raw line from stream
-            
+
         Returns:
             StreamChunk if valid, None otherwise
         """
         line = line.strip()
         if not line:
             return None
-        
+
         try:
-            data = json.loads(line)
-            
-            chunk_type = data.get('type', 'unknown')
-            content = data.get('content', '')
-            metadata = data.get('metadata', {})
-            
-            chunk = StreamChunk(
-                type=chunk_type,
-                content=content,
-                metadata=metadata
-            )
-            
-            self.chunks.append(chunk)
-            return chunk
-            
-        except json.JSONDecodeError as e:
+            data = _decode_line(line)
+        except orjson.JSONDecodeError as e:
             print(f"⚠️ Failed to parse line: {line}")
             print(f"Error: {e}")
             return None
+
+        return self.parse_obj(data)
     
     def parse_stream(self, stream_lines: Iterator[str]) -> Iterator[StreamChunk]:
         """
@@ -86,13 +142,68 @@ class N8nStreamParser:
             if chunk:
                 yield chunk
     
+    def _intern_metadata(self, metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """Return a pooled metadata dict (timestamp stripped) keyed by node"""
+        node_id = metadata.get('nodeId')
+        if node_id is None:
+            return metadata
+
+        stripped = {k: v for k, v in metadata.items() if k != 'timestamp'}
+        pooled = self._meta_pool.get(node_id)
+        if pooled is not None and pooled == stripped:
+            return pooled
+
+        self._meta_pool[node_id] = stripped
+        return stripped
+
+    def _unregister_chunk(self, chunk: StreamChunk):
+        """Drop a chunk evicted from the bounded deque out of the indexes
+
+        Eviction is strictly oldest-first, so the evicted chunk is always
+        at the front of each bucket it was registered in.
+        """
+        bucket = self._by_type[chunk.type]
+        if bucket and bucket[0] is chunk:
+            bucket.pop(0)
+
+        node_id = chunk.metadata.get('nodeId')
+        if node_id is not None:
+            bucket = self._by_node[node_id]
+            if bucket and bucket[0] is chunk:
+                bucket.pop(0)
+            if chunk.type == 'item' and chunk.content:
+                contents = self._content_by_node[node_id]
+                if contents:
+                    contents.pop(0)
+
+    def _register_chunk(self, chunk: StreamChunk):
+        """Update incremental counters for a newly parsed chunk"""
+        self._total_chunks += 1
+        self._type_counts[chunk.type] += 1
+
+        if chunk.type == 'item' and chunk.content:
+            self._content_parts.append(chunk.content)
+            self._complete_content = None  # invalidate cached join
+
+        self._by_type[chunk.type].append(chunk)
+        node_id = chunk.metadata.get('nodeId')
+        if node_id is not None:
+            self._by_node[node_id].append(chunk)
+            if chunk.type == 'item' and chunk.content:
+                self._content_by_node[node_id].append(chunk.content)
+
+        if chunk.timestamp:
+            self._timestamp_count += 1
+            if self._min_timestamp is None or chunk.timestamp < self._min_timestamp:
+                self._min_timestamp = chunk.timestamp
+            if self._max_timestamp is None or chunk.timestamp > self._max_timestamp:
+                self._max_timestamp = chunk.timestamp
+
     def get_complete_content(self) -> str:
         """Get the complete assembled content from all chunks"""
-        content_parts = []
-        for chunk in self.chunks:
-            if chunk.type == 'item' and chunk.content:
-                content_parts.append(chunk.content)
-        return ''.join(content_parts)
+        if self._complete_content is None:
+            self._complete_content = ''.join(self._content_parts)
+        return self._complete_content
     
     def get_session_info(self) -> Dict[str, Any]:
         """Extract session information from chunks"""
@@ -109,39 +220,32 @@ class N8nStreamParser:
     def get_stream_stats(self) -> Dict[str, Any]:
         """Get statistics about the stream"""
         stats = {
-            'total_chunks': len(self.chunks),
-            'content_chunks': len([c for c in self.chunks if c.type == 'item']),
-            'start_chunks': len([c for c in self.chunks if c.type == 'start']),
-            'end_chunks': len([c for c in self.chunks if c.type == 'end']),
+            'total_chunks': self._total_chunks,
+            'content_chunks': self._type_counts['item'],
+            'start_chunks': self._type_counts['start'],
+            'end_chunks': self._type_counts['end'],
             'total_content_length': len(self.get_complete_content()),
-            'has_start': any(c.type == 'start' for c in self.chunks),
-            'has_end': any(c.type == 'end' for c in self.chunks)
+            'has_start': self._type_counts['start'] > 0,
+            'has_end': self._type_counts['end'] > 0
         }
-        
+
         # Add timing info if available
-        timestamps = [c.timestamp for c in self.chunks if c.timestamp]
-        if len(timestamps) >= 2:
-            stats['duration_seconds'] = (max(timestamps) - min(timestamps)).total_seconds()
-        
+        if self._timestamp_count >= 2:
+            stats['duration_seconds'] = (self._max_timestamp - self._min_timestamp).total_seconds()
+
         return stats
     
     def filter_by_type(self, chunk_type: str) -> List[StreamChunk]:
         """Filter chunks by type"""
-        return [c for c in self.chunks if c.type == chunk_type]
-    
+        return list(self._by_type.get(chunk_type, ()))
+
     def filter_by_node(self, node_id: str) -> List[StreamChunk]:
         """Filter chunks by node ID"""
-        return [c for c in self.chunks if c.metadata.get('nodeId') == node_id]
-    
+        return list(self._by_node.get(node_id, ()))
+
     def get_content_by_node(self, node_id: str) -> str:
         """Get complete content from a specific node"""
-        content_parts = []
-        for chunk in self.chunks:
-            if (chunk.type == 'item' and 
-                chunk.metadata.get('nodeId') == node_id and 
-                chunk.content):
-                content_parts.append(chunk.content)
-        return ''.join(content_parts)
+        return ''.join(self._content_by_node.get(node_id, ()))
 
 
 class StreamingContentProcessor:
@@ -198,10 +302,11 @@ def demo_parser():
     # Create parser
     parser = N8nStreamParser()
     
-    # Parse the stream
+    # Parse the stream - buffered lines decode faster as one JSON array
+    # than line by line
     print("📥 Parsing stream...")
-    for line in sample_stream:
-        chunk = parser.parse_line(line)
+    for data in orjson.loads('[' + ','.join(sample_stream) + ']'):
+        chunk = parser.parse_obj(data)
         if chunk:
             print(f"✅ {chunk.type}: {chunk.content}")
     
@@ -2,13 +2,24 @@
 """
 Streaming webhook handler for n8n AI Agent responses
 """
+import asyncio
 import requests
 import json
 import sys
-import time
-from typing import Iterator, Dict, Any, Optional
+import httpx
+import orjson
+from requests.adapters import HTTPAdapter
+from typing import AsyncIterator, Iterator, Dict, Any, Optional
 from env_config import get_auth_credentials, get_webhook_url
 
+# Shared read-only default so .get fallbacks don't allocate a dict per call
+_EMPTY_METADATA: Dict[str, Any] = {}
+
+# Interned chunk-type constants - dispatch on pointer identity per token
+_ITEM = sys.intern('item')
+_START = sys.intern('start')
+_END = sys.intern('end')
+
 
 class StreamingWebhookHandler:
     """Handle streaming responses from n8n webhook"""
@@ -21,8 +32,73 @@ class StreamingWebhookHandler:
         self.session.auth = (username, password)
         self.session.headers.update({
             "Content-Type": "application/json",
-            "User-Agent": "n8n-streaming-client/1.0"
+            "User-Agent": "n8n-streaming-client/1.0",
+            # gzip would re-buffer the response and defeat streaming
+            "Accept-Encoding": "identity"
         })
+        # Keep-alive connection pool so repeated requests skip the TCP+TLS handshake
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._async_client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        """Lazily created httpx client for the async streaming path"""
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(
+                auth=(self.username, self.password),
+                headers={
+                    "Content-Type": "application/json",
+                    "User-Agent": "n8n-streaming-client/1.0"
+                },
+                limits=httpx.Limits(max_keepalive_connections=20),
+                timeout=60
+            )
+        return self._async_client
+
+    async def aclose(self):
+        """Close the async client if it was created"""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+    async def stream(self, data: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Send request and yield streaming responses without blocking the event loop
+
+        Args:
+            data: Request payload
+
+        Yields:
+            Dict containing parsed streaming data
+        """
+        try:
+            # Encode once with orjson instead of httpx's stdlib json encode
+            async with self.async_client.stream(
+                "POST", self.webhook_url, content=orjson.dumps(data)
+            ) as response:
+                if response.status_code != 200:
+                    body = await response.aread()
+                    print(f"❌ Request failed with status: {response.status_code}")
+                    print(f"Response: {body.decode('utf-8', 'replace')}")
+                    return
+
+                # Local bindings keep per-line lookups out of the hot loop
+                loads = orjson.loads
+                async for line in response.aiter_lines():
+                    if line:
+                        try:
+                            yield loads(line)
+                        except orjson.JSONDecodeError as e:
+                            print(f"⚠️ Failed to parse chunk: {line}")
+                            print(f"Error: {e}")
+                            continue
+
+        except httpx.TimeoutException:
+            print("❌ Request timed out")
+        except httpx.ConnectError:
+            print("❌ Connection error")
     
     def send_streaming_request(self, data: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
         """
@@ -39,9 +115,11 @@ class StreamingWebhookHandler:
             print(f"📤 Payload: {json.dumps(data, indent=2, ensure_ascii=False)}")
             print("-" * 60)
             
+            # Session headers already declare application/json; orjson encodes
+            # the body faster than the json= path inside requests
             response = self.session.post(
                 self.webhook_url,
-                json=data,
+                data=orjson.dumps(data),
                 stream=True,
                 timeout=60
             )
@@ -54,15 +132,17 @@ class StreamingWebhookHandler:
             print("✅ Streaming response started")
             print("-" * 60)
             
-            # Process streaming response
-            for line in response.iter_lines(decode_unicode=True):
+            # Process streaming response - raw bytes straight into orjson,
+            # with a large read buffer to cut per-line syscall overhead
+            loads = orjson.loads
+            for line in response.iter_lines(chunk_size=65536, decode_unicode=False):
                 if line:
                     try:
                         # Parse each line as JSON
-                        chunk = json.loads(line)
+                        chunk = loads(line)
                         yield chunk
-                    except json.JSONDecodeError as e:
-                        print(f"⚠️ Failed to parse chunk: {line}")
+                    except orjson.JSONDecodeError as e:
+                        print(f"⚠️ Failed to parse chunk: {line!r}")
                         print(f"Error: {e}")
                         continue
                         
@@ -73,7 +153,57 @@ class StreamingWebhookHandler:
         except Exception as e:
             print(f"❌ Unexpected error: {e}")
     
-    def process_stream(self, data: Dict[str, Any], 
+    async def process_stream_async(self, data: Dict[str, Any],
+                                   on_chunk: Optional[callable] = None,
+                                   on_complete: Optional[callable] = None) -> str:
+        """
+        Async counterpart of process_stream, built on the httpx stream
+
+        Callbacks may be plain functions or coroutine functions.
+
+        Args:
+            data: Request payload
+            on_chunk: Optional callback for each chunk
+            on_complete: Optional callback when stream completes
+
+        Returns:
+            Complete assembled content
+        """
+        content_buf = bytearray()
+        metadata = {}
+
+        async for chunk in self.stream(data):
+            chunk_type = chunk.get('type', 'unknown')
+            # Non-string types can't be interned; they just miss every branch
+            if type(chunk_type) is str:
+                chunk_type = sys.intern(chunk_type)
+
+            if chunk_type is _ITEM:
+                content = chunk.get('content', '')
+                if content:
+                    content_buf += content.encode('utf-8')
+                    if on_chunk:
+                        result = on_chunk(chunk, content)
+                        if asyncio.iscoroutine(result):
+                            await result
+
+            elif chunk_type is _START:
+                metadata['start'] = chunk.get('metadata', _EMPTY_METADATA)
+
+            elif chunk_type is _END:
+                metadata['end'] = chunk.get('metadata', _EMPTY_METADATA)
+                break
+
+        complete_content = content_buf.decode('utf-8')
+
+        if on_complete:
+            result = on_complete(complete_content, metadata)
+            if asyncio.iscoroutine(result):
+                await result
+
+        return complete_content
+
+    def process_stream(self, data: Dict[str, Any],
                       on_chunk: Optional[callable] = None,
                       on_complete: Optional[callable] = None) -> str:
         """
@@ -87,37 +217,44 @@ class StreamingWebhookHandler:
         Returns:
             Complete assembled content
         """
-        content_parts = []
+        # One contiguous buffer instead of a list of small str fragments
+        content_buf = bytearray()
         metadata = {}
-        
+
         for chunk in self.send_streaming_request(data):
             chunk_type = chunk.get('type', 'unknown')
-            
-            if chunk_type == 'item':
+            # Non-string types can't be interned; they fall through to the
+            # diagnostic else branch below
+            if type(chunk_type) is str:
+                chunk_type = sys.intern(chunk_type)
+
+            if chunk_type is _ITEM:
                 # Extract content from streaming item
                 content = chunk.get('content', '')
                 if content:
-                    content_parts.append(content)
-                    print(f"📝 Content: {content}", end='', flush=True)
-                    
+                    content_buf += content.encode('utf-8')
+                    # Buffered write - flushing every token costs a syscall each
+                    sys.stdout.write(content)
+
                     # Call custom chunk handler if provided
                     if on_chunk:
                         on_chunk(chunk, content)
             
-            elif chunk_type == 'start':
+            elif chunk_type is _START:
                 print("🔄 Stream started")
-                metadata['start'] = chunk.get('metadata', {})
+                metadata['start'] = chunk.get('metadata', _EMPTY_METADATA)
                 
-            elif chunk_type == 'end':
+            elif chunk_type is _END:
                 print("\n✅ Stream completed")
-                metadata['end'] = chunk.get('metadata', {})
+                sys.stdout.flush()
+                metadata['end'] = chunk.get('metadata', _EMPTY_METADATA)
                 break
             
             else:
                 print(f"📊 {chunk_type}: {chunk}")
         
         # Assemble complete content
-        complete_content = ''.join(content_parts)
+        complete_content = content_buf.decode('utf-8')
         
         # Call completion handler if provided
         if on_complete: